@@ -0,0 +1,121 @@
+""" Benchmark of the csv to json lines streaming of module-pricing on a synthetic pricing file.
+
+Runs locally, without AWS credentials: the http response is generated on the fly and the multipart upload
+is simulated at a given bandwidth. Reports the throughput and the peak RSS of the process.
+    python3 data-collection/test/benchmark_pricing_stream.py --size-gb 2
+"""
+import argparse
+import io
+import os
+import resource
+import time
+import types
+
+from cfn_tools import load_yaml
+
+DEPLOY_DIR = os.path.join(os.path.dirname(__file__), '..', 'deploy')
+HEADER = [
+    'SKU', 'OfferTermCode', 'RateCode', 'TermType', 'PriceDescription', 'EffectiveDate', 'StartingRange',
+    'EndingRange', 'Unit', 'PricePerUnit', 'Currency', 'RelatedTo', 'LeaseContractLength', 'PurchaseOption',
+    'OfferingClass', 'Product Family', 'serviceCode', 'Location', 'Location Type', 'Instance Type',
+    'Current Generation', 'Instance Family', 'vCPU', 'Physical Processor', 'Clock Speed', 'Memory', 'Storage',
+    'Network Performance', 'Processor Architecture', 'Tenancy', 'Operating System', 'License Model', 'usageType',
+    'operation', 'CapacityStatus', 'Pre Installed S/W', 'regionCode', 'serviceName',
+]
+
+
+def load_pricing_lambda():
+    for key, value in {'CODE_BUCKET': 'code', 'BUCKET_NAME': 'bucket', 'DEST_PREFIX': 'pricing', 'REGIONS': ''}.items():
+        os.environ.setdefault(key, value)
+    with open(os.path.join(DEPLOY_DIR, 'module-pricing.yaml'), encoding='utf-8') as file_:
+        code = load_yaml(file_.read())['Resources']['LambdaFunction']['Properties']['Code']['ZipFile']
+    module = types.ModuleType('module_pricing')
+    exec(compile(code, 'module-pricing.yaml', 'exec'), module.__dict__) #nosec B102 #pylint: disable=exec-used
+    return module
+
+
+class SyntheticPricingCsv(io.RawIOBase):
+    """ a pricing csv of about `size` bytes: 5 lines of preamble, the header, then rows like the ones of AmazonEC2 """
+    def __init__(self, size):
+        super().__init__()
+        preamble = '"FormatVersion","v1.0"\n"Disclaimer","synthetic"\n"Publication Date","2024-01-01T00:00:00Z"\n"Version","1"\n"OfferCode","AmazonEC2"\n'
+        self.pending = (preamble + ','.join(f'"{name}"' for name in HEADER) + '\n').encode()
+        rows = []
+        for index in range(1000):
+            rows.append(','.join(f'"{value}"' for value in [
+                f'SKU{index:013d}', 'JRTCKXETXF', f'SKU{index:013d}.JRTCKXETXF.6YS6EN2CT7', 'OnDemand',
+                f'$0.{index:04d} per On Demand Linux m5.large Instance Hour', '2024-01-01T00:00:00Z', '0', 'Inf', 'Hrs',
+                f'0.{index:010d}', 'USD', '', '', '', '', 'Compute Instance', 'AmazonEC2', 'US East (N. Virginia)',
+                'AWS Region', 'm5.large', 'Yes', 'General purpose', '2', 'Intel Xeon Platinum 8175', '3.1 GHz', '8 GiB',
+                'EBS only', 'Up to 10 Gigabit', '64-bit', 'Shared', 'Linux', 'No License required',
+                'USE1-BoxUsage:m5.large', 'RunInstances', 'Used', 'NA', 'us-east-1', 'Amazon Elastic Compute Cloud',
+            ]))
+        self.block = ('\n'.join(rows) + '\n').encode()
+        self.remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.pending:
+            if self.remaining <= 0:
+                return 0
+            self.pending = self.block
+            self.remaining -= len(self.block)
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+class SimulatedS3:
+    """ multipart upload that discards the parts after a delay matching the bandwidth """
+    def __init__(self, bandwidth):
+        self.bandwidth = bandwidth
+        self.parts = 0
+        self.uploaded = 0
+
+    def create_multipart_upload(self, **_):
+        return {'UploadId': 'benchmark'}
+
+    def upload_part(self, Body, **_): #pylint: disable=invalid-name
+        time.sleep(len(Body) / self.bandwidth)
+        self.parts += 1
+        self.uploaded += len(Body)
+        return {'ETag': 'etag'}
+
+    def complete_multipart_upload(self, **_):
+        pass
+
+    def abort_multipart_upload(self, **_):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-gb', type=float, default=2.0, help='size of the synthetic csv')
+    parser.add_argument('--upload-mbps', type=float, default=200.0, help='simulated s3 bandwidth in MB/s')
+    args = parser.parse_args()
+
+    pricing = load_pricing_lambda()
+    size = int(args.size_gb * 1024 ** 3)
+    response = io.BufferedReader(SyntheticPricingCsv(size), buffer_size=1024 * 1024)
+    response.release_conn = lambda: None
+    s3 = SimulatedS3(args.upload_mbps * 1024 ** 2)
+    pricing.HTTP = types.SimpleNamespace(request=lambda *a, **k: response)
+    pricing.boto3 = types.SimpleNamespace(client=lambda service: s3)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    start = time.perf_counter()
+    pricing.stream_csv_to_s3('https://pricing.us-east-1.amazonaws.com/benchmark.csv', 'bucket', 'key')
+    elapsed = time.perf_counter() - start
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # KiB on Linux
+    print(f'csv:        {size / 1024 ** 2:,.0f} MB in {elapsed:,.1f} s')
+    print(f'throughput: {size / 1024 ** 2 / elapsed:,.1f} MB/s of csv')
+    print(f'json lines: {s3.uploaded / 1024 ** 2:,.0f} MB in {s3.parts} parts of {pricing.PART_SIZE / 1024 ** 2:,.0f} MB, {pricing.UPLOAD_WORKERS} upload workers') #pylint: disable=no-member
+    print(f'peak RSS:   {peak_rss:,.0f} MB ({rss_before:,.0f} MB before streaming)')
+
+
+if __name__ == '__main__':
+    main()
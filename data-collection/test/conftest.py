@@ -0,0 +1,29 @@
+""" Unit tests of the Lambda code embedded in the CloudFormation templates.
+
+These tests run locally, without AWS credentials, and do not deploy anything:
+    python3 -m pytest data-collection/test
+"""
+import os
+import types
+
+import pytest
+from cfn_tools import load_yaml
+
+DEPLOY_DIR = os.path.join(os.path.dirname(__file__), '..', 'deploy')
+
+
+@pytest.fixture
+def load_lambda(monkeypatch):
+    """ returns a function that loads the inline code of a Lambda from a template as a python module """
+    def _load(template, env=None, resource='LambdaFunction'):
+        monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+        monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+        monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+        for key, value in (env or {}).items():
+            monkeypatch.setenv(key, value)
+        with open(os.path.join(DEPLOY_DIR, template), encoding='utf-8') as file_:
+            code = load_yaml(file_.read())['Resources'][resource]['Properties']['Code']['ZipFile']
+        module = types.ModuleType(os.path.splitext(template)[0].replace('-', '_'))
+        exec(compile(code, template, "exec"), module.__dict__) #nosec B102 #pylint: disable=exec-used
+        return module
+    return _load
@@ -0,0 +1,157 @@
+""" the account collector must list the accounts longest first, so that the Distributed Map ends sooner on skewed organizations """
+#pylint: disable=redefined-outer-name
+import heapq
+import io
+import json
+import random
+import types
+
+import pytest
+
+COLLECTOR_ENV = {
+    'BUCKET_NAME': 'bucket',
+    'MANAGEMENT_ACCOUNT_IDS': '111111111111',
+    'RESOURCE_PREFIX': 'cid-',
+    'ROLE_NAME': 'role',
+    'REGIONS': 'us-east-1',
+}
+MAX_CONCURRENCY = 60 # of DataCollectionMap in main-state-machine.json
+
+
+def makespan(durations, workers=MAX_CONCURRENCY):
+    """ end of a map run that starts the items in list order, as soon as one of the workers is free """
+    free_at = [0.0] * workers
+    for duration in durations:
+        heapq.heappush(free_at, heapq.heappop(free_at) + duration)
+    return max(free_at)
+
+
+def skewed_org(seed, accounts=1200):
+    """ seconds per account: mostly small accounts, a heavy tail of large ones, in random (organizations) order """
+    rng = random.Random(seed)
+    return {f'{index:012d}': round(rng.paretovariate(1.2) * 20, 1) for index in range(accounts)}
+
+
+class S3:
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key): #pylint: disable=invalid-name
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)].encode())}
+
+    def put_object(self, Bucket, Key, Body): #pylint: disable=invalid-name
+        self.objects[(Bucket, Key)] = Body
+
+
+@pytest.fixture
+def collector(load_lambda):
+    module = load_lambda('account-collector.yaml', env=COLLECTOR_ENV)
+    module.s3 = S3()
+    module.BROKER = types.SimpleNamespace(client=lambda service, *a, **k: module.s3)
+    return module
+
+
+MAP_RUN_ARN = 'arn:aws:states:us-east-1:123456789012:mapRun:cid-CID-DC-rds-StateMachine/DataCollectionMap:0b1c2d3e-0000-4000-8000-000000000000'
+STATE_MACHINE_ARN = 'arn:aws:states:us-east-1:123456789012:stateMachine:cid-CID-DC-rds-StateMachine/DataCollectionMap'
+
+
+def result_record(index, account_id, seconds):
+    """ a child execution in a ResultWriter file without transformation: metadata, and the output as a json string """
+    name = f'{index:08x}-0000-4000-8000-000000000000'
+    return {
+        'ExecutionArn': f'{STATE_MACHINE_ARN}:{name}',
+        'Input': json.dumps({'account': json.dumps({'account_id': account_id, 'account_name': '', 'payer_id': '111111111111'})}),
+        'InputDetails': {'Included': True},
+        'Name': name,
+        'Output': json.dumps({'account_id': account_id, 'seconds': seconds}),
+        'OutputDetails': {'Included': True},
+        'RedriveCount': 0,
+        'RedriveStatus': 'NOT_REDRIVABLE',
+        'RedriveStatusReason': 'Execution is SUCCEEDED and cannot be redriven',
+        'StartDate': '2026-01-01T00:00:00.000Z',
+        'StateMachineArn': STATE_MACHINE_ARN,
+        'Status': 'SUCCEEDED',
+        'StopDate': '2026-01-01T00:01:00.000Z',
+    }
+
+
+def map_run(collector, durations, transformation='NONE', files=2):
+    """ writes the ResultWriter files of a map run like main-state-machine.json and returns ResultWriterDetails
+
+    NONE keeps the metadata of the child executions with their output as a json string, COMPACT keeps the outputs only.
+    """
+    prefix = f'logs/mapruns/rds/{MAP_RUN_ARN.rsplit(":", 1)[-1]}'
+    records = [
+        result_record(index, account_id, seconds) if transformation == 'NONE' else {'account_id': account_id, 'seconds': seconds}
+        for index, (account_id, seconds) in enumerate(durations.items())
+    ]
+    succeeded = []
+    for index in range(files):
+        key = f'{prefix}/SUCCEEDED_{index}.json'
+        body = json.dumps(records[index::files])
+        collector.s3.put_object('bucket', key, body)
+        succeeded.append({'Key': key, 'Size': len(body)})
+    collector.s3.put_object('bucket', f'{prefix}/manifest.json', json.dumps({
+        'DestinationBucket': 'bucket',
+        'MapRunArn': MAP_RUN_ARN,
+        'ResultFiles': {'FAILED': [], 'PENDING': [], 'SUCCEEDED': succeeded},
+    }))
+    return {'Bucket': 'bucket', 'Key': f'{prefix}/manifest.json'}
+
+
+def account_list(account_ids):
+    return [{'account': json.dumps({'account_id': account_id, 'account_name': '', 'payer_id': '111111111111'})} for account_id in account_ids]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_longest_first_shortens_the_map_run(collector, seed):
+    durations = skewed_org(seed)
+    history = collector.RuntimeHistory.of('rds')
+    assert history.record(map_run(collector, durations)) == len(durations)
+
+    ordered = collector.RuntimeHistory.of('rds').order(account_list(durations))
+
+    ordered_ids = [json.loads(account['account'])['account_id'] for account in ordered]
+    assert sorted(ordered_ids) == sorted(durations)
+    assert [durations[a] for a in ordered_ids] == sorted(durations.values(), reverse=True)
+    lower_bound = max(*durations.values(), sum(durations.values()) / MAX_CONCURRENCY)
+    assert makespan(durations[a] for a in ordered_ids) <= 1.05 * lower_bound
+
+
+def test_large_accounts_listed_last(collector):
+    """ the case of the request: a few large accounts at the end of the organizations order """
+    durations = {f'{index:012d}': 30.0 for index in range(2400)}
+    durations.update({f'9{index:011d}': 1800.0 for index in range(10)})
+    collector.RuntimeHistory.of('rds').record(map_run(collector, durations))
+
+    ordered = collector.RuntimeHistory.of('rds').order(account_list(durations))
+
+    organizations_order = makespan(durations.values())
+    longest_first = makespan(durations[json.loads(account['account'])['account_id']] for account in ordered)
+    assert longest_first <= 0.8 * organizations_order
+
+
+def test_unknown_accounts_get_the_default_estimate(collector):
+    collector.RuntimeHistory.of('rds').record(map_run(collector, {'000000000001': 300.0, '000000000002': 5.0}))
+
+    ordered = collector.RuntimeHistory.of('rds').order(account_list(['000000000002', '000000000003', '000000000001', '000000000004']))
+
+    assert [json.loads(account['account'])['account_id'] for account in ordered] == ['000000000001', '000000000003', '000000000004', '000000000002']
+
+
+def test_record_averages_with_previous_runs(collector):
+    collector.RuntimeHistory.of('rds').record(map_run(collector, {'000000000001': 100.0}))
+    collector.RuntimeHistory.of('rds').record(map_run(collector, {'000000000001': 300.0}))
+
+    assert collector.RuntimeHistory.of('rds').estimate('000000000001') == 200.0
+    assert collector.RuntimeHistory.of('rds', 'params').estimate('000000000001') == collector.DEFAULT_DURATION_SECONDS
+
+
+@pytest.mark.parametrize('transformation', ['NONE', 'COMPACT'])
+def test_record_reads_the_result_files(collector, transformation):
+    durations = {'000000000001': 12.5, '000000000002': 300.0, '000000000003': 41.0}
+
+    assert collector.RuntimeHistory.of('rds').record(map_run(collector, durations, transformation)) == 3
+
+    history = collector.RuntimeHistory.of('rds')
+    assert {account_id: history.estimate(account_id) for account_id in durations} == durations
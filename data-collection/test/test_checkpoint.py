@@ -0,0 +1,74 @@
+""" Checkpoint must replace the listing of the data of a payer, and never move back """
+#pylint: disable=redefined-outer-name
+import io
+import json
+import types
+from datetime import datetime, timezone
+
+import pytest
+
+BACKUP_ENV = {
+    'BUCKET_NAME': 'bucket',
+    'ROLENAME': 'role',
+    'PREFIX': 'backup',
+}
+KEY = 'backup/backup-checkpoints/jobs-111111111111.json'
+DATA_PREFIX = 'backup/backup-jobs-data/payer_id=111111111111'
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class S3:
+    exceptions = types.SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+        self.listed = []
+
+    def get_object(self, Bucket, Key): #pylint: disable=invalid-name
+        if (Bucket, Key) not in self.objects:
+            raise NoSuchKey(Key)
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)].encode())}
+
+    def put_object(self, Bucket, Key, Body): #pylint: disable=invalid-name
+        self.objects[(Bucket, Key)] = Body
+
+    def get_paginator(self, _):
+        return self
+
+    def paginate(self, Bucket, Prefix): #pylint: disable=invalid-name,unused-argument
+        self.listed.append(Prefix)
+        dates = [datetime(2026, 1, day, tzinfo=timezone.utc) for day in (3, 9, 5)]
+        return types.SimpleNamespace(search=lambda _: iter(dates))
+
+
+@pytest.fixture
+def checkpoint(load_lambda):
+    backup = load_lambda('module-backup.yaml', env=BACKUP_ENV)
+    s3 = S3()
+    backup.boto3 = types.SimpleNamespace(client=lambda service: s3)
+    checkpoint = backup.Checkpoint('bucket', KEY, DATA_PREFIX)
+    checkpoint.s3 = s3
+    return checkpoint
+
+
+def test_listing_without_checkpoint(checkpoint):
+    assert checkpoint.last_collection() == datetime(2026, 1, 9, tzinfo=timezone.utc)
+    assert checkpoint.s3.listed == [DATA_PREFIX]
+
+
+def test_checkpoint_replaces_the_listing(checkpoint):
+    checkpoint.advance(datetime(2026, 2, 1, tzinfo=timezone.utc))
+
+    assert checkpoint.last_collection() == datetime(2026, 2, 1, tzinfo=timezone.utc)
+    assert not checkpoint.s3.listed
+    assert json.loads(checkpoint.s3.objects[('bucket', KEY)]) == {'last_collection': '2026-02-01T00:00:00+00:00'}
+
+
+def test_checkpoint_never_moves_back(checkpoint):
+    checkpoint.advance(datetime(2026, 2, 1, tzinfo=timezone.utc))
+    checkpoint.advance(datetime(2026, 1, 15, tzinfo=timezone.utc))
+
+    assert checkpoint.last_collection() == datetime(2026, 2, 1, tzinfo=timezone.utc)
@@ -0,0 +1,135 @@
+""" ClientBroker must assume a role once per account, refresh the credentials before they expire and reuse the clients """
+#pylint: disable=redefined-outer-name,too-few-public-methods
+import types
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+INVENTORY_ENV = {
+    'PREFIX': 'inventory',
+    'BUCKET_NAME': 'bucket',
+    'ROLE_NAME': 'role',
+    'REGIONS': 'us-east-1',
+}
+
+
+class Sts:
+    """ assume_role returns credentials valid for `lifetime` """
+    def __init__(self):
+        self.lifetime = timedelta(hours=1)
+        self.calls = []
+
+    def assume_role(self, RoleArn, RoleSessionName): #pylint: disable=invalid-name
+        self.calls.append((RoleArn, RoleSessionName))
+        return {'Credentials': {
+            'AccessKeyId': f'key-{len(self.calls)}',
+            'SecretAccessKey': 'secret',
+            'SessionToken': 'token',
+            'Expiration': datetime.now(timezone.utc) + self.lifetime,
+        }}
+
+
+class LocalSession:
+    """ the Lambda's own session """
+    region_name = 'us-east-1'
+
+    def __init__(self, sts):
+        self.sts = sts
+
+    def get_partition_for_region(self, region_name):
+        return 'aws-cn' if region_name.startswith('cn-') else 'aws'
+
+    def client(self, service, **_):
+        return self.sts if service == 'sts' else types.SimpleNamespace(service=service)
+
+
+class Limiter:
+    def __init__(self):
+        self.attached = []
+
+    def attach(self, client, key):
+        self.attached.append(key)
+        return client
+
+
+@pytest.fixture
+def inventory(load_lambda):
+    return load_lambda('module-inventory.yaml', env=INVENTORY_ENV)
+
+
+@pytest.fixture
+def broker(inventory):
+    broker = inventory.ClientBroker('role', limiter=Limiter())
+    broker.local = LocalSession(Sts())
+    return broker
+
+
+def test_role_assumed_once_per_account(broker):
+    first = broker.client('ec2', '111111111111', 'us-east-1')
+
+    assert broker.client('ec2', '111111111111', 'us-east-1') is first
+    assert broker.client('ec2', '111111111111', 'eu-west-1') is not first
+    broker.client('ec2', '222222222222', 'us-east-1')
+
+    assert broker.local.sts.calls == [
+        ('arn:aws:iam::111111111111:role/role', 'data_collection'),
+        ('arn:aws:iam::222222222222:role/role', 'data_collection'),
+    ]
+    # the local sts client is created once and reused for the second account
+    assert broker.stats == {'sts_calls': 2, 'sts_calls_saved': 2, 'clients_created': 4, 'clients_reused': 2}
+    assert [key for key in broker.limiter.attached if key[0]] == [
+        ('111111111111', 'ec2', 'us-east-1'),
+        ('111111111111', 'ec2', 'eu-west-1'),
+        ('222222222222', 'ec2', 'us-east-1'),
+    ]
+
+
+def test_partition_and_role_are_part_of_the_session_key(broker):
+    broker.client('ec2', '111111111111', 'cn-north-1')
+    broker.client('ec2', '111111111111', 'us-east-1', role_name='other')
+
+    assert broker.local.sts.calls == [
+        ('arn:aws-cn:iam::111111111111:role/role', 'data_collection'),
+        ('arn:aws:iam::111111111111:role/other', 'data_collection'),
+    ]
+
+
+def test_credentials_refreshed_before_expiration(broker):
+    broker.local.sts.lifetime = timedelta(seconds=broker.refresh_margin.total_seconds() + 60)
+    first = broker.client('ec2', '111111111111', 'us-east-1')
+    assert broker.client('ec2', '111111111111', 'us-east-1') is first
+
+    broker.local.sts.lifetime = timedelta(hours=1)
+    key = ('111111111111', 'role', 'aws')
+    session, _ = broker.sessions[key]
+    broker.sessions[key] = (session, datetime.now(timezone.utc) + broker.refresh_margin - timedelta(seconds=1))
+    refreshed = broker.client('ec2', '111111111111', 'us-east-1')
+
+    assert refreshed is not first
+    assert len(broker.local.sts.calls) == 2
+    assert refreshed._request_signer._credentials.access_key == 'key-2' #pylint: disable=protected-access
+
+
+def test_clients_of_expired_session_are_evicted(broker):
+    broker.client('ec2', '111111111111', 'us-east-1')
+    broker.client('s3', '111111111111', 'eu-west-1')
+    broker.client('ec2', '222222222222', 'us-east-1')
+    key = ('111111111111', 'role', 'aws')
+    session, _ = broker.sessions[key]
+    broker.sessions[key] = (session, datetime.now(timezone.utc))
+
+    broker.client('ec2', '111111111111', 'us-east-1')
+
+    assert sorted((client_key[0][0], client_key[1], client_key[2]) for client_key in broker.clients if client_key[0][0]) == [
+        ('111111111111', 'ec2', 'us-east-1'),
+        ('222222222222', 'ec2', 'us-east-1'),
+    ]
+
+
+def test_local_clients_need_no_role(broker):
+    first = broker.client('s3')
+
+    assert broker.client('s3') is first
+    assert first.service == 's3'
+    assert not broker.local.sts.calls
+    assert broker.stats['sts_calls'] == 0
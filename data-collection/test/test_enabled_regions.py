@@ -0,0 +1,87 @@
+""" EnabledRegions must narrow the regions of the accounts to the enabled ones, and drop the accounts without any """
+#pylint: disable=redefined-outer-name,too-few-public-methods
+import json
+import types
+
+import pytest
+
+COLLECTOR_ENV = {
+    'BUCKET_NAME': 'bucket',
+    'MANAGEMENT_ACCOUNT_IDS': '111111111111',
+    'RESOURCE_PREFIX': 'cid-',
+    'ROLE_NAME': 'role',
+    'REGIONS': 'us-east-1,eu-south-1,ap-east-1',
+}
+SCOPE = ['us-east-1', 'eu-south-1', 'ap-east-1']
+PAYER = '111111111111'
+OPT_IN = {'eu-south-1', 'ap-east-1'}
+ENABLED = { # account -> enabled regions, None when ListRegions fails
+    PAYER: ['us-east-1', 'eu-south-1', 'ap-east-1'],
+    '000000000001': ['us-east-1', 'eu-south-1'],
+    '000000000002': ['us-east-1', 'eu-south-1', 'ap-east-1'],
+    '000000000003': ['us-east-1'],
+    '000000000004': None,
+    '000000000005': ['us-east-1'],
+}
+
+
+class Account:
+    def get_paginator(self, _):
+        return self
+
+    def paginate(self, **params):
+        account_id = params.get('AccountId', PAYER)
+        if ENABLED[account_id] is None:
+            raise RuntimeError(f'cannot list regions of {account_id}')
+        regions = [
+            {'RegionName': name, 'RegionOptStatus': 'ENABLED' if name in OPT_IN else 'ENABLED_BY_DEFAULT'}
+            for name in ENABLED[account_id]
+        ]
+        return types.SimpleNamespace(search=lambda _: iter(regions))
+
+
+class S3:
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key): #pylint: disable=invalid-name,unused-argument
+        raise RuntimeError('NoSuchKey')
+
+    def put_object(self, Bucket, Key, Body): #pylint: disable=invalid-name,unused-argument
+        self.objects[Key] = Body
+
+
+@pytest.fixture
+def enabled_regions(load_lambda, monkeypatch):
+    collector = load_lambda('account-collector.yaml', env=COLLECTOR_ENV)
+    clients = {'s3': S3(), 'account': Account()}
+    monkeypatch.setattr(collector, 'BROKER', types.SimpleNamespace(client=lambda service, *_, **__: clients[service]))
+    return collector.EnabledRegions('bucket', 'enabled-regions.json'), collector
+
+
+def regions_of(accounts):
+    return {json.loads(a['account'])['account_id']: json.loads(a['account'])['regions'] for a in accounts}
+
+
+def test_apply(enabled_regions):
+    regions, collector = enabled_regions
+    accounts = [collector.format_account(account_id, '', PAYER) for account_id in ('000000000001', '000000000002', '000000000003', '000000000004')]
+    accounts.append(collector.format_account('000000000005', '', PAYER, regions='ap-east-1'))
+
+    result = regions_of(regions.apply(accounts, SCOPE))
+
+    assert result == {
+        '000000000001': 'us-east-1,eu-south-1', # narrowed
+        '000000000002': '', # unchanged: all the regions in scope
+        '000000000003': 'us-east-1', # narrowed
+        '000000000004': '', # lookup failure: left as it is
+    } # 000000000005: none of its regions enabled, removed
+    assert regions.stats == {'checked': 4, 'from_cache': 0, 'failed': 1, 'narrowed': 2, 'removed': 1}
+
+
+def test_regions_without_opt_in_are_not_checked(enabled_regions):
+    regions, collector = enabled_regions
+    accounts = [collector.format_account('000000000004', '', PAYER)]
+
+    assert regions.apply(accounts, ['us-east-1']) == accounts
+    assert regions.stats['failed'] == 0
@@ -0,0 +1,194 @@
+""" A failed batch of the Health detail state machine must not lose events nor move the checkpoint """
+#pylint: disable=redefined-outer-name
+import io
+import os
+import csv
+import json
+import types
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from cfn_tools import load_yaml
+
+DEPLOY_DIR = os.path.join(os.path.dirname(__file__), '..', 'deploy')
+
+HEALTH_ENV = {
+    'BUCKET_NAME': 'bucket',
+    'ROLE_NAME': 'role',
+    'PREFIX': 'health-events',
+    'LOOKBACK': '730',
+    'DETAIL_SM_ARN': 'arn:aws:states:us-east-1:111111111111:stateMachine:detail',
+}
+ACCOUNT = {'account_id': '111111111111', 'payer_id': '111111111111'}
+CHECKPOINT = 'health-events/health-events-checkpoints/111111111111.json'
+DETAIL_PREFIX = 'health-events/health-events-detail-data/payer_id=111111111111/'
+BATCH_SIZE = 2
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class S3:
+    exceptions = types.SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key): #pylint: disable=invalid-name,unused-argument
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {'Body': io.BytesIO(self.objects[Key].encode())}
+
+    def put_object(self, Bucket, Key, Body): #pylint: disable=invalid-name,unused-argument
+        self.objects[Key] = Body
+
+    def upload_file(self, filename, bucket, key): #pylint: disable=unused-argument
+        with open(filename, encoding='utf-8') as file_:
+            self.objects[key] = file_.read()
+
+    def delete_object(self, Bucket, Key): #pylint: disable=invalid-name,unused-argument
+        del self.objects[Key]
+
+    def delete_objects(self, Bucket, Delete): #pylint: disable=invalid-name,unused-argument
+        for obj in Delete['Objects']:
+            del self.objects[obj['Key']]
+
+    def get_paginator(self, _):
+        return self
+
+    def paginate(self, Bucket, Prefix): #pylint: disable=invalid-name,unused-argument
+        keys = sorted(key for key in self.objects if key.startswith(Prefix))
+        return types.SimpleNamespace(search=lambda expression: iter(keys if expression == 'Contents[].Key' else []))
+
+
+class Health:
+    """ public events, the details of the events in failing raise """
+    def __init__(self):
+        self.events = {}
+        self.failing = set()
+
+    def update(self, updated, *arns):
+        for arn in arns:
+            self.events[arn] = {'arn': arn, 'eventScopeCode': 'PUBLIC', 'lastUpdatedTime': updated}
+
+    def describe_events_for_organization(self, **args):
+        start = datetime.strptime(args['filter']['lastUpdatedTime']['from'], '%Y-%m-%dT%H:%M:%S%z')
+        return {'events': [event for event in self.events.values() if event['lastUpdatedTime'] >= start]}
+
+    def describe_entity_aggregates_for_organization(self, eventArns): #pylint: disable=invalid-name,unused-argument
+        return {'organizationEntityAggregates': []}
+
+    def describe_event_details_for_organization(self, organizationEventDetailFilters): #pylint: disable=invalid-name
+        arn = organizationEventDetailFilters[0]['eventArn']
+        if arn in self.failing:
+            raise RuntimeError(f'cannot read {arn}')
+        event = dict(self.events[arn], lastUpdatedTime=self.events[arn]['lastUpdatedTime'].isoformat())
+        return {'successfulSet': [{'event': event, 'eventDescription': {'latestDescription': arn}}]}
+
+    def describe_affected_entities_for_organization(self, organizationEntityFilters): #pylint: disable=invalid-name,unused-argument
+        return {'entities': []}
+
+
+@pytest.fixture
+def health_events(load_lambda, monkeypatch, tmp_path):
+    module = load_lambda('module-health-events.yaml', env=HEALTH_ENV)
+    module.s3, module.health, module.executions, module.now = S3(), Health(), [], [None]
+    clients = {
+        's3': module.s3,
+        'health': module.health,
+        'sts': types.SimpleNamespace(assume_role=lambda **_: {'Credentials': {'AccessKeyId': 'a', 'SecretAccessKey': 's', 'SessionToken': 't'}}),
+        'stepfunctions': types.SimpleNamespace(start_execution=lambda stateMachineArn, input: module.executions.append(json.loads(input))),
+    }
+    monkeypatch.setattr(module, 'boto3', types.SimpleNamespace(
+        client=lambda service, **_: clients[service],
+        session=types.SimpleNamespace(Session=lambda: types.SimpleNamespace(get_partition_for_region=lambda region_name: 'aws')),
+    ))
+
+    class Clock(datetime):
+        @classmethod
+        def now(cls, tz=None): #pylint: disable=unused-argument
+            return module.now[0]
+
+    monkeypatch.setattr(module, 'datetime', Clock)
+    monkeypatch.setattr(module, 'get_active_health_region', lambda: 'us-east-1')
+    monkeypatch.setattr(module, 'LIMITER', types.SimpleNamespace(attach=lambda client, key: client, report=dict))
+    monkeypatch.setattr(module, 'TMP_FILE', str(tmp_path / 'data.json'))
+    return module
+
+
+def collect(health_events, now):
+    """ one summary run, then its detail state machine: batches in order, finalize only if none failed """
+    health_events.now[0] = now
+    health_events.lambda_handler({'account': json.dumps(ACCOUNT)}, None)
+    if not health_events.executions:
+        return []
+    sf_input = health_events.executions.pop()
+    rows = list(csv.DictReader(io.StringIO(health_events.s3.objects[sf_input['file']])))
+    failed = False
+    for i in range(0, len(rows), BATCH_SIZE):
+        try:
+            health_events.lambda_handler({'account': sf_input['account'], 'ingestion_time': sf_input['ingestion_time'], 'items': rows[i:i + BATCH_SIZE]}, None)
+        except RuntimeError:
+            failed = True
+    if not failed:
+        health_events.lambda_handler({'account': sf_input['account'], 'ingestion_time': sf_input['ingestion_time'], 'finalize': True}, None)
+    return [row['eventArn'] for row in rows]
+
+
+def detail_records(health_events):
+    """ event arn -> last_updated_time of each stored record """
+    records = {}
+    for key, body in health_events.s3.objects.items():
+        if key.startswith(DETAIL_PREFIX):
+            for line in body.splitlines():
+                record = json.loads(line)
+                records.setdefault(record['event_arn'], []).append(record['last_updated_time'])
+    return records
+
+
+def checkpoint(health_events):
+    return json.loads(health_events.s3.objects[CHECKPOINT])['last_collection']
+
+
+def test_failed_batch_is_collected_again(health_events):
+    first, second, third = (datetime(2026, 3, 2, hour, tzinfo=timezone.utc) for hour in (10, 12, 14))
+    health_events.health.update(first - timedelta(hours=1), 'a', 'b', 'c', 'd')
+    assert collect(health_events, first) == ['a', 'b', 'c', 'd']
+    assert checkpoint(health_events) == first.isoformat()
+
+    updated = (second - timedelta(hours=1)).isoformat()
+    health_events.health.update(second - timedelta(hours=1), 'a', 'b', 'c', 'd')
+    health_events.health.failing = {'c'}
+    assert collect(health_events, second) == ['a', 'b', 'c', 'd']
+    assert checkpoint(health_events) == first.isoformat()
+    records = detail_records(health_events)
+    assert len(records['c']) == 1 and len(records['d']) == 1 # previous records kept
+
+    health_events.health.failing = set()
+    assert collect(health_events, third) == ['c', 'd']
+    assert checkpoint(health_events) == third.isoformat()
+    assert detail_records(health_events) == {arn: [updated] for arn in 'abcd'}
+
+
+def test_summary_without_change_moves_the_checkpoint(health_events):
+    first, second = datetime(2026, 3, 2, 10, tzinfo=timezone.utc), datetime(2026, 3, 3, 10, tzinfo=timezone.utc)
+    health_events.health.update(first - timedelta(hours=1), 'a')
+    collect(health_events, first)
+
+    assert not collect(health_events, second)
+    assert checkpoint(health_events) == second.isoformat()
+
+
+def test_detail_batches_share_the_api_rate(load_lambda):
+    with open(os.path.join(DEPLOY_DIR, 'module-health-events.yaml'), encoding='utf-8') as file_:
+        resources = load_yaml(file_.read())['Resources']
+    with open(os.path.join(DEPLOY_DIR, 'source', 'step-functions', 'health-detail-state-machine.json'), encoding='utf-8') as file_:
+        definition = file_.read()
+    assert '"MaxConcurrency": ${MaxConcurrentBatches},' in definition
+    concurrency = resources['StepFunctionDetail']['Properties']['DefinitionSubstitutions']['MaxConcurrentBatches']
+    assert resources['LambdaFunction']['Properties']['Environment']['Variables']['DETAIL_BATCHES'] == concurrency
+
+    module = load_lambda('module-health-events.yaml', env=dict(HEALTH_ENV, DETAIL_BATCHES='4', HEALTH_API_RATE='10'))
+    assert module.LIMITER.max_rate * 4 == 10
+    assert module.LIMITER.rate <= module.LIMITER.max_rate
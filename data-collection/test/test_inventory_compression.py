@@ -0,0 +1,91 @@
+""" upload_compressed_to_s3 of module-inventory must send the region shards as one gzip object, in parts """
+#pylint: disable=redefined-outer-name
+import gzip
+import types
+
+import pytest
+
+INVENTORY_ENV = {
+    'PREFIX': 'inventory',
+    'BUCKET_NAME': 'bucket',
+    'ROLE_NAME': 'role',
+    'REGIONS': 'us-east-1',
+    'COMPRESS_OUTPUT': 'yes',
+}
+PART_SIZE = 1024
+
+
+class S3:
+    """ multipart uploads assembled in memory """
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.deleted = []
+
+    def put_object(self, Body, Bucket, Key): #pylint: disable=invalid-name,unused-argument
+        self.objects[Key] = Body
+
+    def delete_object(self, Bucket, Key): #pylint: disable=invalid-name,unused-argument
+        self.deleted.append(Key)
+        self.objects.pop(Key, None)
+
+    def create_multipart_upload(self, Bucket, Key): #pylint: disable=invalid-name,unused-argument
+        self.uploads[Key] = {}
+        return {'UploadId': Key}
+
+    def upload_part(self, Body, Bucket, Key, PartNumber, UploadId): #pylint: disable=invalid-name,unused-argument,too-many-arguments
+        self.uploads[Key][PartNumber] = Body
+        return {'ETag': f'etag-{PartNumber}'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload): #pylint: disable=invalid-name,unused-argument
+        parts = self.uploads.pop(Key)
+        self.objects[Key] = b''.join(parts[part['PartNumber']] for part in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId): #pylint: disable=invalid-name,unused-argument
+        self.uploads.pop(Key)
+
+
+@pytest.fixture
+def inventory(load_lambda, monkeypatch, tmp_path):
+    module = load_lambda('module-inventory.yaml', env=INVENTORY_ENV)
+    module.s3 = S3()
+    monkeypatch.setattr(module, 'BROKER', types.SimpleNamespace(client=lambda service, **_: module.s3))
+    monkeypatch.setattr(module.S3MultipartWriter.__init__, '__defaults__', (PART_SIZE,))
+    monkeypatch.setattr(module, 'get_s3_key', lambda name, account_id, payer_id, ext='json': f'{name}/{account_id}.{ext}')
+    module.tmp_path = tmp_path
+    return module
+
+
+def shards(inventory, contents):
+    paths = []
+    for region, content in contents.items():
+        path = inventory.tmp_path / f'data.json.{region}'
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths
+
+
+def test_shards_round_trip_in_parts(inventory):
+    contents = {
+        region: b''.join(b'{"region": "%s", "id": %d, "pad": "%s"}\n' % (region.encode(), i, str(i * 7919).encode() * 9) for i in range(300))
+        for region in ('us-east-1', 'eu-west-1', 'ap-south-1')
+    }
+    paths = shards(inventory, contents)
+
+    inventory.upload_compressed_to_s3('ebs', '111111111111', '222222222222', paths)
+
+    body = inventory.s3.objects['ebs/111111111111.json.gz']
+    assert gzip.decompress(body) == b''.join(contents.values())
+    assert len(body) > 2 * PART_SIZE # several parts, not a single put
+    assert inventory.s3.deleted == ['ebs/111111111111.json']
+    assert not list(inventory.tmp_path.iterdir())
+
+
+def test_empty_shards_upload_nothing(inventory):
+    paths = shards(inventory, {'us-east-1': b'', 'eu-west-1': b''})
+
+    inventory.upload_compressed_to_s3('ebs', '111111111111', '222222222222', paths)
+
+    assert not inventory.s3.objects
+    assert not inventory.s3.deleted
+    assert not list(inventory.tmp_path.iterdir())
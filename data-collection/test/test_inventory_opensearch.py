@@ -0,0 +1,110 @@
+""" opensearch_domains_scan of module-inventory must return the same records as the former per-domain implementation """
+#pylint: disable=redefined-outer-name
+import threading
+
+import boto3
+import pytest
+from botocore.stub import Stubber
+
+INVENTORY_ENV = {
+    'PREFIX': 'inventory',
+    'BUCKET_NAME': 'bucket',
+    'ROLE_NAME': 'role',
+    'REGIONS': 'us-east-1',
+}
+
+
+def domain_status(index):
+    return {
+        'DomainId': f'123456789012/domain-{index}',
+        'DomainName': f'domain-{index}',
+        'ARN': f'arn:aws:es:us-east-1:123456789012:domain/domain-{index}',
+        'EngineVersion': 'OpenSearch_2.11' if index % 2 else 'Elasticsearch_7.10',
+        'ClusterConfig': {'InstanceType': 'r6g.large.search', 'InstanceCount': index % 3 + 1},
+    }
+
+
+def reference_scan(client):
+    """ the former implementation: one describe_domain per domain """
+    domain_names = [name.get('DomainName') for name in client.list_domain_names().get('DomainNames', [])]
+    for domain_name in domain_names:
+        domain = client.describe_domain(DomainName=domain_name)['DomainStatus']
+        yield {
+            'DomainName': domain['DomainName'],
+            'DomainId': domain['DomainId'],
+            'EngineVersion': domain['EngineVersion'],
+            'InstanceType': domain['ClusterConfig']['InstanceType'],
+            'InstanceCount': domain['ClusterConfig']['InstanceCount'],
+        }
+
+
+def reference_records(statuses):
+    client = boto3.client('opensearch', region_name='us-east-1')
+    with Stubber(client) as stubber:
+        stubber.add_response('list_domain_names', {'DomainNames': [{'DomainName': s['DomainName']} for s in statuses]})
+        for status in statuses:
+            stubber.add_response('describe_domain', {'DomainStatus': status}, {'DomainName': status['DomainName']})
+        records = list(reference_scan(client))
+        stubber.assert_no_pending_responses()
+    return records
+
+
+class BatchedOpenSearch: #pylint: disable=too-few-public-methods
+    """ answers the calls of a client from canned statuses; unlike Stubber, it does not depend on the order of concurrent calls """
+    def __init__(self, client, statuses, deny_batch=False):
+        self.statuses = {s['DomainName']: s for s in statuses}
+        self.deny_batch = deny_batch
+        self.lock = threading.Lock()
+        self.batches = []
+        client.meta.events.register('before-parameter-build.opensearch', self.keep_params)
+        client.meta.events.register('before-call.opensearch', self)
+
+    @staticmethod
+    def keep_params(params, context, **_):
+        context['api_params'] = dict(params)
+
+    def __call__(self, model, context, **_):
+        params = context['api_params']
+        if model.name == 'ListDomainNames':
+            return self.response(200, {'DomainNames': [{'DomainName': name} for name in self.statuses]})
+        if model.name == 'DescribeDomains':
+            with self.lock:
+                self.batches.append(params['DomainNames'])
+            if self.deny_batch:
+                return self.response(403, {'Error': {'Code': 'AccessDeniedException', 'Message': 'denied'}})
+            # the API does not promise to keep the order of the names
+            return self.response(200, {'DomainStatusList': [self.statuses[n] for n in reversed(params['DomainNames'])]})
+        if model.name == 'DescribeDomain':
+            return self.response(200, {'DomainStatus': self.statuses[params['DomainName']]})
+        raise AssertionError(f'unexpected call {model.name}')
+
+    @staticmethod
+    def response(status, body):
+        return type('HttpResponse', (), {'status_code': status, 'headers': {}})(), dict(body, ResponseMetadata={'HTTPStatusCode': status})
+
+
+@pytest.fixture
+def inventory(load_lambda):
+    return load_lambda('module-inventory.yaml', INVENTORY_ENV)
+
+
+def batched_records(inventory, statuses, deny_batch=False):
+    client = boto3.client('opensearch', region_name='us-east-1')
+    stub = BatchedOpenSearch(client, statuses, deny_batch)
+    inventory.BROKER.client = lambda *args, **kwargs: client
+    return list(inventory.opensearch_domains_scan(account_id='123456789012', region='us-east-1')), stub
+
+
+@pytest.mark.parametrize('count', [0, 1, 5, 6, 23])
+def test_same_records_as_per_domain_scan(inventory, count):
+    statuses = [domain_status(i) for i in range(count)]
+    records, stub = batched_records(inventory, statuses)
+    assert records == reference_records(statuses)
+    assert all(len(batch) <= inventory.OPENSEARCH_BATCH_SIZE for batch in stub.batches)
+    assert len(stub.batches) == -(-count // inventory.OPENSEARCH_BATCH_SIZE)
+
+
+def test_falls_back_to_describe_domain_when_batch_is_denied(inventory):
+    statuses = [domain_status(i) for i in range(7)]
+    records, _ = batched_records(inventory, statuses, deny_batch=True)
+    assert records == reference_records(statuses)
@@ -0,0 +1,102 @@
+""" the granular policies must expand OUs from the organization tree, and fail rather than ignore a deny OU that cannot be read """
+#pylint: disable=redefined-outer-name,too-few-public-methods
+import types
+
+import pytest
+from botocore.exceptions import ClientError
+
+COLLECTOR_ENV = {
+    'BUCKET_NAME': 'bucket',
+    'MANAGEMENT_ACCOUNT_IDS': '111111111111',
+    'RESOURCE_PREFIX': 'cid-',
+    'ROLE_NAME': 'role',
+    'REGIONS': 'us-east-1',
+}
+TREE = { # parent -> (accounts, OUs)
+    'r-root': (['000000000001'], ['ou-a', 'ou-b']),
+    'ou-a': (['000000000002', '000000000003'], ['ou-a1']),
+    'ou-a1': (['000000000004'], []),
+    'ou-b': (['000000000005'], []),
+}
+
+
+class Organizations:
+    """ list_children of TREE; errors: {parent id: error code} """
+    def __init__(self, errors=None):
+        self.errors = errors or {}
+        self.calls = []
+
+    def get_paginator(self, _):
+        return self
+
+    def paginate(self, ParentId, ChildType): #pylint: disable=invalid-name
+        self.calls.append((ParentId, ChildType))
+        if ParentId in self.errors:
+            raise ClientError({'Error': {'Code': self.errors[ParentId], 'Message': 'error'}}, 'ListChildren')
+        accounts, ous = TREE.get(ParentId, ([], []))
+        return types.SimpleNamespace(search=lambda _: iter(accounts if ChildType == 'ACCOUNT' else ous))
+
+
+@pytest.fixture
+def collector(load_lambda):
+    return load_lambda('account-collector.yaml', env=COLLECTOR_ENV)
+
+
+def policy(principal, policy_type, regions=('us-east-1',)):
+    return {'principal': principal, 'policy_type': policy_type, 'regions': list(regions), 'payload': {}, 'module': 'rds'}
+
+
+def test_accounts_under(collector):
+    organizations = Organizations()
+    tree = collector.OrganizationTree(organizations)
+
+    assert tree.accounts_under('ou-a') == ['000000000002', '000000000003', '000000000004']
+    assert tree.accounts_under('r-root') == ['000000000001', '000000000002', '000000000003', '000000000004', '000000000005']
+    assert tree.accounts_under('ou-a1') == ['000000000004']
+    assert len(organizations.calls) == 2 * len(TREE) # each parent is read once
+
+
+def test_ou_of_another_organization_is_empty(collector):
+    tree = collector.OrganizationTree(Organizations(errors={'ou-b': 'ParentNotFoundException'}))
+
+    assert tree.accounts_under('r-root') == ['000000000001', '000000000002', '000000000003', '000000000004']
+
+
+def test_deny_ou_expanded(collector):
+    expander = collector.OrganizationsPrincipalExpander(Organizations())
+
+    allowed = expander.process_policies([policy('r-root', 'ALLOW'), policy('ou-a', 'DENY', ['*'])], 'rds')
+
+    assert list(allowed) == ['000000000001', '000000000005']
+
+
+@pytest.mark.parametrize('code', ['TooManyRequestsException', 'ServiceException', 'AccessDeniedException', 'AccessDenied'])
+def test_ou_that_cannot_be_read_fails(collector, code):
+    expander = collector.OrganizationsPrincipalExpander(Organizations(errors={'ou-a1': code}))
+
+    with pytest.raises(ClientError):
+        expander.process_policies([policy('r-root', 'ALLOW'), policy('ou-a', 'DENY', ['*'])], 'rds')
+
+
+def test_deny_regions(collector):
+    expander = collector.OrganizationsPrincipalExpander(Organizations())
+
+    allowed = expander.process_policies([
+        policy('r-root', 'ALLOW', ['us-east-1', 'eu-west-1']),
+        policy('*', 'DENY', ['eu-west-1']),
+        policy('000000000002', 'DENY', ['us-east-1']),
+        policy('ou-b', 'DENY', ['*']),
+        policy('999999999999', 'DENY', ['*']),
+    ], 'rds')
+
+    assert {account_id: p['regions'] for account_id, p in allowed.items()} == {
+        '000000000001': ['us-east-1'],
+        '000000000003': ['us-east-1'],
+        '000000000004': ['us-east-1'],
+    }
+
+
+def test_deny_all_regions_of_all_accounts(collector):
+    expander = collector.OrganizationsPrincipalExpander(Organizations())
+
+    assert not expander.process_policies([policy('r-root', 'ALLOW'), policy('*', 'DENY', ['*'])], 'rds')
@@ -0,0 +1,142 @@
+""" stream_csv_to_s3 of module-pricing must upload the rows of the csv as json lines or parquet, in order, in bounded parts """
+#pylint: disable=redefined-outer-name
+import csv
+import io
+import json
+import threading
+import types
+
+import pytest
+
+PRICING_ENV = {
+    'CODE_BUCKET': 'code-bucket',
+    'BUCKET_NAME': 'bucket',
+    'DEST_PREFIX': 'pricing',
+    'REGIONS': 'us-east-1',
+}
+PREAMBLE = '"FormatVersion","v1.0"\n"Disclaimer","..."\n"Publication Date","2024-01-01T00:00:00Z"\n"Version","1"\n"OfferCode","AmazonEC2"\n'
+
+
+def pricing_csv(rows):
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(['SKU', 'TermType', 'PriceDescription', 'PricePerUnit', 'Currency', 'Location'])
+    for index in range(rows):
+        writer.writerow([f'SKU{index:08d}', 'OnDemand', f'$0.{index % 97:04d} per "On Demand", Linux', f'0.{index % 97:04d}', 'USD', 'US East (N. Virginia)'])
+    return (PREAMBLE + out.getvalue()).encode()
+
+
+class Response(io.BytesIO):
+    """ the streamed http response of urllib3 """
+    released = False
+
+    def release_conn(self):
+        self.released = True
+
+
+class S3:
+    """ records the multipart upload calls; fail_part makes upload_part fail for that part """
+    def __init__(self, fail_part=None):
+        self.fail_part = fail_part
+        self.lock = threading.Lock()
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+
+    def create_multipart_upload(self, **_):
+        return {'UploadId': 'upload-id'}
+
+    def upload_part(self, Body, PartNumber, **_): #pylint: disable=invalid-name
+        if PartNumber == self.fail_part:
+            raise RuntimeError('upload failed')
+        with self.lock:
+            self.parts[PartNumber] = Body
+        return {'ETag': f'etag-{PartNumber}'}
+
+    def complete_multipart_upload(self, MultipartUpload, **_): #pylint: disable=invalid-name
+        self.completed = MultipartUpload['Parts']
+
+    def abort_multipart_upload(self, **_):
+        self.aborted = True
+
+
+@pytest.fixture
+def pricing(load_lambda, monkeypatch):
+    module = load_lambda('module-pricing.yaml', env=PRICING_ENV)
+
+    def use(data, s3):
+        response = Response(data)
+        monkeypatch.setattr(module, 'HTTP', types.SimpleNamespace(request=lambda *a, **k: response))
+        monkeypatch.setattr(module, 'boto3', types.SimpleNamespace(client=lambda service: s3))
+        return response
+    module.use = use
+    return module
+
+
+@pytest.mark.parametrize('rows', [0, 1, 999, 5000])
+def test_stream_csv_to_s3(pricing, rows):
+    data = pricing_csv(rows)
+    s3 = S3()
+    response = pricing.use(data, s3)
+    part_size = 16 * 1024
+
+    assert pricing.stream_csv_to_s3('https://pricing/offer.csv', 'bucket', 'key', part_size=part_size)
+
+    expected = list(csv.DictReader(io.StringIO(data.decode().split('\n', 5)[5])))
+    assert s3.completed == [{'PartNumber': n, 'ETag': f'etag-{n}'} for n in range(1, len(s3.parts) + 1)]
+    body = b''.join(s3.parts[n] for n in sorted(s3.parts))
+    assert [json.loads(line) for line in body.splitlines()] == expected
+    assert all(len(s3.parts[n]) >= part_size for n in sorted(s3.parts)[:-1])
+    assert all(len(s3.parts[n]) < part_size + 1024 for n in s3.parts)
+    assert response.released
+
+
+def test_stream_csv_to_s3_aborts_on_failure(pricing):
+    s3 = S3(fail_part=2)
+    pricing.use(pricing_csv(5000), s3)
+
+    with pytest.raises(RuntimeError):
+        pricing.stream_csv_to_s3('https://pricing/offer.csv', 'bucket', 'key', part_size=16 * 1024)
+    assert s3.aborted
+    assert s3.completed is None
+
+
+def test_stream_csv_to_s3_projects_and_filters(pricing):
+    data = pricing_csv(500)
+    s3 = S3()
+    pricing.use(data, s3)
+    columns = ['SKU', 'PricePerUnit', 'Missing']
+    filters = pricing.parse_filters('PricePerUnit=0.0001|0.0002;TermType=OnDemand')
+
+    pricing.stream_csv_to_s3('https://pricing/offer.csv', 'bucket', 'key', columns=columns, filters=filters)
+
+    expected = [
+        {'SKU': row['SKU'], 'PricePerUnit': row['PricePerUnit']}
+        for row in csv.DictReader(io.StringIO(data.decode().split('\n', 5)[5]))
+        if row['PricePerUnit'] in ('0.0001', '0.0002')
+    ]
+    body = b''.join(s3.parts[n] for n in sorted(s3.parts))
+    assert [json.loads(line) for line in body.splitlines()] == expected
+
+
+def test_parse_filters(pricing):
+    assert pricing.parse_filters('') == {}
+    assert pricing.parse_filters('CapacityStatus=Used|;TermType=OnDemand') == {'CapacityStatus': {'Used', ''}, 'TermType': {'OnDemand'}}
+
+
+def test_stream_csv_to_s3_parquet(pricing, monkeypatch):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    monkeypatch.setattr(pricing, 'ROW_GROUP_SIZE', 1000)
+    data = pricing_csv(5000)
+    s3 = S3()
+    pricing.use(data, s3)
+
+    pricing.stream_csv_to_s3('https://pricing/offer.csv', 'bucket', 'key', part_size=16 * 1024, columns=['SKU', 'Location'], output_format='parquet')
+
+    table = parquet.read_table(io.BytesIO(b''.join(s3.parts[n] for n in sorted(s3.parts))))
+    assert table.column_names == ['SKU', 'Location']
+    assert table.to_pylist() == [
+        {'SKU': row['SKU'], 'Location': row['Location']}
+        for row in csv.DictReader(io.StringIO(data.decode().split('\n', 5)[5]))
+    ]
+    assert parquet.ParquetFile(io.BytesIO(b''.join(s3.parts[n] for n in sorted(s3.parts)))).num_row_groups == 5
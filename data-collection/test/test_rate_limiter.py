@@ -0,0 +1,121 @@
+""" RateLimiter must settle on the rate a service accepts: additive increase, multiplicative decrease on throttling """
+#pylint: disable=redefined-outer-name,too-few-public-methods
+import json
+import types
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.config import Config
+
+INVENTORY_ENV = {
+    'PREFIX': 'inventory',
+    'BUCKET_NAME': 'bucket',
+    'ROLE_NAME': 'role',
+    'REGIONS': 'us-east-1',
+}
+KEY = ('111111111111', 'dynamodb', 'us-east-1')
+
+
+class Clock:
+    """ time.monotonic and time.sleep without waiting """
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Raw:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self):
+        yield self.body
+
+
+@pytest.fixture
+def inventory(load_lambda):
+    return load_lambda('module-inventory.yaml', env=INVENTORY_ENV)
+
+
+@pytest.fixture
+def clock(inventory, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(inventory, 'time', types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep))
+    return clock
+
+
+def test_additive_increase_up_to_max_rate(inventory):
+    limiter = inventory.RateLimiter(rate=2.0, max_rate=3.0, increase=0.5)
+
+    limiter.success(KEY)
+    assert limiter.buckets[KEY]['rate'] == 2.5
+    for _ in range(10):
+        limiter.success(KEY)
+    assert limiter.buckets[KEY]['rate'] == 3.0
+
+
+def test_multiplicative_decrease_down_to_min_rate(inventory):
+    limiter = inventory.RateLimiter(rate=8.0, min_rate=1.5, decrease=0.5)
+
+    limiter.throttled(KEY)
+    assert limiter.buckets[KEY]['rate'] == 4.0
+    assert limiter.buckets[KEY]['tokens'] == 0.0
+    limiter.throttled(KEY)
+    limiter.throttled(KEY)
+    assert limiter.buckets[KEY]['rate'] == 1.5
+    assert limiter.report()['111111111111/dynamodb/us-east-1']['throttled'] == 3
+
+
+def test_acquire_paces_at_the_rate(inventory, clock):
+    limiter = inventory.RateLimiter(rate=4.0)
+
+    for _ in range(9):
+        limiter.acquire(KEY)
+
+    assert clock.now == pytest.approx(2.0) # one token at start, then 4 per second
+    assert limiter.stats[KEY]['calls'] == 9
+    limiter.acquire(('111111111111', 'dynamodb', 'eu-west-1'))
+    assert clock.now == pytest.approx(2.0) # buckets are per key
+
+
+def test_hooks_return_none(inventory):
+    """ botocore takes the first value returned by a before-send handler as the response, and a needs-retry one as the retry delay """
+    handlers = {}
+    events = types.SimpleNamespace(register=handlers.__setitem__)
+    client = types.SimpleNamespace(meta=types.SimpleNamespace(
+        events=events,
+        service_model=boto3.client('dynamodb', region_name='us-east-1').meta.service_model,
+    ))
+    limiter = inventory.RateLimiter()
+    limiter.attach(client, KEY)
+    throttled = (types.SimpleNamespace(status_code=400), {'Error': {'Code': 'ThrottlingException'}})
+    accepted = (types.SimpleNamespace(status_code=200), {})
+
+    assert sorted(handlers) == ['before-send.dynamodb', 'needs-retry.dynamodb']
+    assert handlers['before-send.dynamodb'](request=None) is None
+    assert handlers['needs-retry.dynamodb'](response=throttled, attempts=1) is None
+    assert handlers['needs-retry.dynamodb'](response=accepted, attempts=2) is None
+    assert handlers['needs-retry.dynamodb'](response=None, caught_exception=ConnectionError(), attempts=3) is None
+    assert limiter.stats[KEY] == {'calls': 1, 'throttled': 1, 'waited_sec': 0.0, 'rate': 5.5}
+
+
+def test_throttled_request_slows_down_and_is_retried(inventory):
+    limiter = inventory.RateLimiter(rate=10.0, increase=1.0)
+    client = limiter.attach(boto3.client('dynamodb', region_name='us-east-1', config=Config(retries={'mode': 'standard', 'max_attempts': 3})), KEY)
+    responses = [
+        (400, {'__type': 'com.amazonaws.dynamodb.v20120810#ThrottlingException', 'message': 'Rate exceeded'}),
+        (200, {'TableNames': ['table']}),
+    ]
+
+    def send(request, **_):
+        status, body = responses.pop(0)
+        return AWSResponse(request.url, status, {'x-amzn-requestid': 'id'}, Raw(json.dumps(body).encode()))
+    client.meta.events.register_last('before-send.dynamodb.ListTables', send)
+
+    assert client.list_tables()['TableNames'] == ['table']
+    assert limiter.stats[KEY] == {'calls': 2, 'throttled': 1, 'waited_sec': limiter.stats[KEY]['waited_sec'], 'rate': 6.0}
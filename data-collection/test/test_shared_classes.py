@@ -0,0 +1,36 @@
+""" the helper classes copied in the inline code of several templates must stay identical, so that a fix goes to all of them """
+import glob
+import os
+import textwrap
+
+import pytest
+
+REPO_DIR = os.path.join(os.path.dirname(__file__), '..', '..')
+SHARED_CLASSES = ['ClientBroker', 'RateLimiter', 'Checkpoint', 'WatermarkStore']
+
+
+def class_copies(name):
+    """ {template: source of the class, dedented} for each template that defines the class """
+    copies = {}
+    for path in sorted(glob.glob(os.path.join(REPO_DIR, '**', 'deploy', '*.yaml'), recursive=True)):
+        with open(path, encoding='utf-8') as file_:
+            lines = file_.read().split('\n')
+        for index, line in enumerate(lines):
+            if line.lstrip().startswith(f'class {name}'):
+                indent = len(line) - len(line.lstrip())
+                body = [line]
+                for following in lines[index + 1:]:
+                    if following.strip() and len(following) - len(following.lstrip()) <= indent:
+                        break
+                    body.append(following)
+                copies[os.path.relpath(path, REPO_DIR)] = textwrap.dedent('\n'.join(body).rstrip() + '\n')
+    return copies
+
+
+@pytest.mark.parametrize('name', SHARED_CLASSES)
+def test_copies_are_identical(name):
+    copies = class_copies(name)
+    assert len(copies) > 1, f'{name} is not shared anymore, remove it from SHARED_CLASSES'
+    reference_template, reference = next(iter(copies.items()))
+    for template, source in copies.items():
+        assert source == reference, f'{name} of {template} differs from the one of {reference_template}'
@@ -0,0 +1,149 @@
+""" A support case that cannot be collected must not stop the others nor the save of the index """
+#pylint: disable=redefined-outer-name,too-few-public-methods
+import io
+import json
+import types
+
+import pytest
+
+SUPPORT_ENV = {
+    'BUCKET_NAME': 'bucket',
+    'ROLE_NAME': 'role',
+    'MODULE_NAME': 'support-cases',
+}
+ACCOUNT = {'account_id': '111111111111', 'payer_id': '222222222222', 'account_name': 'test'}
+INDEX = 'support-cases/support-cases-index/payer_id=222222222222/111111111111.json'
+
+
+class NoSuchKey(Exception):
+    response = {'Error': {'Code': 'NoSuchKey'}}
+
+
+class S3:
+    exceptions = types.SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key): #pylint: disable=invalid-name,unused-argument
+        if Key not in self.objects:
+            raise NoSuchKey(Key)
+        return {'Body': io.BytesIO(self.objects[Key].encode())}
+
+    def put_object(self, Bucket, Key, Body, **_): #pylint: disable=invalid-name,unused-argument
+        self.objects[Key] = Body
+
+
+class Support:
+    """ cases listed by describe_cases, which raises after list_until of them; describe_communications of the cases in failing raise """
+    def __init__(self, cases, failing, list_until=None):
+        self.cases = cases
+        self.failing = failing
+        self.list_until = list_until
+
+    def get_paginator(self, operation):
+        return types.SimpleNamespace(paginate=lambda **args: types.SimpleNamespace(search=lambda _: self.pages(operation, args)))
+
+    def pages(self, operation, args):
+        if operation == 'describe_cases':
+            return self.listing()
+        if args['caseId'] in self.failing:
+            raise RuntimeError(f"cannot read {args['caseId']}")
+        return iter([{'CaseId': args['caseId'], 'Body': 'hello', 'TimeCreated': '2026-03-01T10:00:00.000Z'}])
+
+    def listing(self):
+        for i, case_ in enumerate(self.cases):
+            if i == self.list_until:
+                raise RuntimeError('DescribeCases failed')
+            yield dict(case_)
+
+
+class Events:
+    """ PutEvents raises once fail_after events are sent; the entries of the cases in rejected come back with an ErrorCode """
+    def __init__(self, fail_after=None, rejected=()):
+        self.sent = []
+        self.fail_after = fail_after
+        self.rejected = set(rejected)
+
+    def put_events(self, Entries): #pylint: disable=invalid-name
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            raise RuntimeError('PutEvents failed')
+        case_ids = [json.loads(entry['Detail'])['CommunicationsKey'].rsplit('/', 1)[-1][:-5] for entry in Entries]
+        self.sent += [case_id for case_id in case_ids if case_id not in self.rejected]
+        entries = [{'ErrorCode': 'InternalFailure'} if case_id in self.rejected else {} for case_id in case_ids]
+        return {'FailedEntryCount': sum('ErrorCode' in entry for entry in entries), 'Entries': entries}
+
+
+def case(case_id, status='opened'):
+    return {
+        'CaseId': case_id, 'Status': status, 'TimeCreated': '2026-03-01T09:00:00.000Z',
+        'RecentCommunications': ['2026-03-01T10:00:00.000Z'],
+    }
+
+
+@pytest.fixture
+def support_cases(load_lambda, monkeypatch):
+    module = load_lambda('module-support-cases.yaml', env=SUPPORT_ENV)
+    module.s3 = S3()
+    module.s3.objects[INDEX] = json.dumps({
+        'unchanged': ['opened', '2026-03-01T10:00:00.000Z', 1],
+        'changed-fails': ['unassigned', '2026-03-01T10:00:00.000Z', 1],
+    })
+
+    def run(cases, failing=(), events=None, list_until=None):
+        clients = {'s3': module.s3, 'support': Support(cases, set(failing), list_until), 'events': events or Events()}
+        monkeypatch.setattr(module, 'BROKER', types.SimpleNamespace(client=lambda service, *_, **__: clients[service], stats={}))
+        module.main(ACCOUNT, 'role', 'support-cases', 'bucket')
+        return clients['events'].sent
+
+    module.run = run
+    return module
+
+
+def test_failed_case_is_left_out_of_the_index(support_cases):
+    cases = [case('unchanged'), case('changed-fails'), case('new-fails'), case('new')]
+
+    sent = support_cases.run(cases, failing=['changed-fails', 'new-fails'])
+
+    assert sent == ['new']
+    index = json.loads(support_cases.s3.objects[INDEX])
+    assert index == {
+        'unchanged': ['opened', '2026-03-01T10:00:00.000Z', 1],
+        'changed-fails': ['unassigned', '2026-03-01T10:00:00.000Z', 1], # previous entry kept
+        'new': ['opened', '2026-03-01T10:00:00.000Z', 1],
+    }
+    assert support_cases.run(cases) == ['changed-fails', 'new-fails']
+
+
+def test_index_saved_when_sending_fails(support_cases, monkeypatch):
+    monkeypatch.setattr(support_cases, 'EVENTS_BATCH_SIZE', 1)
+    events = Events(fail_after=1)
+
+    with pytest.raises(RuntimeError):
+        support_cases.run([case('first'), case('second')], events=events)
+
+    assert events.sent == ['first']
+    assert set(json.loads(support_cases.s3.objects[INDEX])) == {'first', 'unchanged', 'changed-fails'}
+
+
+def test_index_kept_when_listing_fails(support_cases):
+    cases = [case('new'), case('changed-fails'), case('unchanged')]
+
+    with pytest.raises(RuntimeError):
+        support_cases.run(cases, list_until=1)
+
+    index = json.loads(support_cases.s3.objects[INDEX])
+    assert index == { # not listed, previous entries kept
+        'unchanged': ['opened', '2026-03-01T10:00:00.000Z', 1],
+        'changed-fails': ['unassigned', '2026-03-01T10:00:00.000Z', 1],
+    }
+    assert support_cases.run(cases) == ['new', 'changed-fails']
+
+
+def test_rejected_event_is_sent_again(support_cases):
+    cases = [case('unchanged'), case('new'), case('rejected')]
+
+    assert support_cases.run(cases, events=Events(rejected=['rejected'])) == ['new']
+
+    assert 'rejected' not in json.loads(support_cases.s3.objects[INDEX])
+    assert support_cases.run(cases) == ['rejected']
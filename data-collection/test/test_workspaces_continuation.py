@@ -0,0 +1,140 @@
+""" module-workspaces-metrics must collect every workspace exactly once across the invocations chained by its continuation """
+#pylint: disable=redefined-outer-name,too-few-public-methods
+import io
+import json
+import types
+
+import pytest
+
+WORKSPACES_ENV = {
+    'BUCKET_NAME': 'bucket',
+    'PREFIX': 'workspaces-metrics',
+    'ROLENAME': 'role',
+    'REGIONS': 'us-east-1,eu-west-1,ap-southeast-2',
+    'ROLE_SESSION_NAME': 'data_collection',
+}
+WORKSPACES = {'us-east-1': 300, 'eu-west-1': 130, 'ap-southeast-2': 0}
+MAX_INVOCATIONS = 50 # of ContinueCollection in main-state-machine.json
+
+
+class NoSuchKey(Exception):
+    pass
+
+
+class S3:
+    exceptions = types.SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key): #pylint: disable=invalid-name
+        if (Bucket, Key) not in self.objects:
+            raise NoSuchKey(Key)
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)].encode())}
+
+    def put_object(self, Bucket, Key, Body): #pylint: disable=invalid-name
+        self.objects[(Bucket, Key)] = Body
+
+
+class Context:
+    """ a Lambda invocation that has time for `batches` metric batches after the timeout buffer """
+    def __init__(self, module, batches):
+        self.remaining_ms = module.LAMBDA_TIMEOUT_BUFFER * 1000 + batches * 1000
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+@pytest.fixture
+def workspaces(load_lambda, monkeypatch):
+    module = load_lambda('module-workspaces-metrics.yaml', env=WORKSPACES_ENV)
+    s3 = S3()
+    module.stored = []
+    module.invocation = {}
+    module.listing = {region: [f'ws-{region}-{index:04d}' for index in range(count)] for region, count in WORKSPACES.items()}
+    monkeypatch.setattr(module, 'BROKER', types.SimpleNamespace(
+        client=lambda service, *a, **k: s3 if service == 's3' else types.SimpleNamespace(region=a[1] if len(a) > 1 else None),
+        stats={},
+    ))
+    monkeypatch.setattr(module, 'describe_workspaces_with_retry', lambda client: [
+        {'WorkspaceId': workspace_id} for workspace_id in module.listing[client.region]
+    ])
+
+    def process_workspace_batch(batch, *_):
+        module.invocation['context'].remaining_ms -= 1000
+        if module.invocation.get('fallback_after') == 0:
+            module._use_batch_api = False #pylint: disable=protected-access
+        module.invocation['fallback_after'] = module.invocation.get('fallback_after', -1) - 1
+        module.invocation['api'].add(module._use_batch_api) #pylint: disable=protected-access
+        return [{'WorkspaceId': ws['WorkspaceId']} for ws in batch], []
+    monkeypatch.setattr(module, 'process_workspace_batch', process_workspace_batch)
+    monkeypatch.setattr(module, 'store_data_to_s3', lambda data, region, *_: module.stored.extend(w['WorkspaceId'] for w in data))
+    return module
+
+
+def run_account(workspaces, batches, fallback_after=-1, between=None):
+    """ invokes the Lambda like the state machine: again with the continuation it returns, up to MAX_INVOCATIONS
+    between(invocation) can change the workspaces before each invocation after the first one
+    """
+    continuations = []
+    continuation = None
+    for invocation in range(MAX_INVOCATIONS):
+        if invocation and between:
+            between(invocation)
+        workspaces.invocation = {'context': Context(workspaces, batches), 'api': set(), 'fallback_after': fallback_after}
+        fallback_after = -1
+        event = {'account': json.dumps({'account_id': '111111111111', 'payer_id': '222222222222'})}
+        if continuation:
+            event['continuation'] = continuation
+        result = workspaces.lambda_handler(event, workspaces.invocation['context'])
+        if result == 'Successful':
+            return continuations
+        continuation = result['continuation']
+        continuations.append((continuation, workspaces.invocation['api']))
+    raise AssertionError('account not complete')
+
+
+@pytest.mark.parametrize('batches', [1, 2, 3, 100])
+def test_every_workspace_collected_once(workspaces, batches):
+    continuations = run_account(workspaces, batches)
+
+    expected = [f'ws-{region}-{index:04d}' for region, count in WORKSPACES.items() for index in range(count)]
+    assert workspaces.stored == expected
+    if batches == 100:
+        assert not continuations
+
+
+def test_continuation_cursor(workspaces):
+    continuations = run_account(workspaces, batches=2)
+
+    assert [continuation for continuation, _ in continuations] == [
+        {'region': 'us-east-1', 'api': 'batch'},
+        {'region': 'us-east-1', 'api': 'batch'},
+        {'region': 'eu-west-1', 'api': 'batch'}, # us-east-1 complete, no time left for eu-west-1
+        {'region': 'eu-west-1', 'api': 'batch'},
+    ]
+
+
+def test_workspaces_created_and_deleted_between_invocations(workspaces):
+    listing = workspaces.listing['us-east-1']
+
+    def change_workspaces(invocation):
+        if invocation == 1: # listed before the next ones, and one collected and one not yet collected are deleted
+            listing.insert(0, 'ws-us-east-1-new')
+            listing.remove('ws-us-east-1-0000')
+            listing.remove('ws-us-east-1-0200')
+
+    run_account(workspaces, batches=2, between=change_workspaces)
+
+    expected = ['ws-us-east-1-0000'] + workspaces.listing['us-east-1'] + workspaces.listing['eu-west-1']
+    assert sorted(workspaces.stored) == sorted(expected)
+    assert len(workspaces.stored) == len(set(workspaces.stored))
+
+
+def test_fallback_api_carried_by_the_continuation(workspaces):
+    continuations = run_account(workspaces, batches=2, fallback_after=1)
+
+    assert continuations[0][0]['api'] == 'fallback'
+    assert continuations[0][1] == {True, False}
+    assert all(continuation['api'] == 'fallback' and api == {False} for continuation, api in continuations[1:])
+    assert len(workspaces.stored) == len(set(workspaces.stored)) == sum(WORKSPACES.values())